@@ -1,6 +1,9 @@
+import datetime
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, Iterator
+from typing import Iterable, Iterator, Optional
 from .ims_file import ImsFile
 
 
@@ -13,6 +16,15 @@ class ImsDatabase(Iterable):
     path: Path
     recordings: list[ImsFile]
 
+    """`recordings` ordered by `start_time` (built on first iteration from `_start_times`)"""
+    _sorted_recordings: Optional[list[ImsFile]]
+
+    """per-recording columns (same order as `recordings`; built on first use, start times separately from the ids)"""
+    _player_ids: Optional[list[str]]
+    _track_ids: Optional[list[str]]
+    _simulator_ids: Optional[list[str]]
+    _start_times: Optional[list[datetime.datetime]]
+
     def __init__(self, path: Path):
         assert path.is_dir(), "Path is no directory (Code: 39482093)"
         self.path = path
@@ -25,21 +37,62 @@ class ImsDatabase(Iterable):
         :return:
         """
         self.recordings = [*self._load_file_index()]
+        self._sorted_recordings = None
+        self._player_ids = None
+        self._track_ids = None
+        self._simulator_ids = None
+        self._start_times = None
 
     @property
     def players(self) -> set[str]:
         """ parses all unique player names in the DB"""
-        return set(sess.player_id for sess in self.recordings)
+        self._build_index()
+        return set(self._player_ids)
 
     @property
     def tracks(self) -> set[str]:
         """ parses all unique tracks in the DB"""
-        return set(sess.track_id for sess in self.recordings)
+        self._build_index()
+        return set(self._track_ids)
 
     @property
     def simulators(self) -> set[str]:
         """ parses all unique tracks in the DB"""
-        return set(sess.simulator_id for sess in self.recordings)
+        self._build_index()
+        return set(self._simulator_ids)
+
+    def prefetch(self, max_workers: int = 8):
+        """
+        parses the static data of all recordings which are not loaded yet using a thread pool
+        :param max_workers: amount of threads reading the files concurrently
+        :return:
+        """
+        pending = [sess for sess in self.recordings if not sess.is_static_data_loaded]
+        if not pending:
+            return
+
+        # the threads only read and parse, assigning happens here to not contend on `cached_property`
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for sess, static_data in zip(pending, executor.map(ImsFile.read_static_data, pending)):
+                sess.static_data = static_data
+
+    def _build_index(self):
+        """ collects the frequently queried fields of all recordings into flat lists (once per `refresh`)"""
+        if self._player_ids is not None:
+            return
+
+        self.prefetch()
+        self._player_ids = [sess.player_id for sess in self.recordings]
+        self._track_ids = [sess.track_id for sess in self.recordings]
+        self._simulator_ids = [sess.simulator_id for sess in self.recordings]
+
+    def _build_start_times(self):
+        """ collects the start times of all recordings (once per `refresh`); only requires `startTime` to be set"""
+        if self._start_times is not None:
+            return
+
+        self.prefetch()
+        self._start_times = [sess.start_time for sess in self.recordings]
 
     @property
     def n_recordings(self) -> int:
@@ -47,17 +100,27 @@ class ImsDatabase(Iterable):
         return len(self.recordings)
 
     def _load_file_index(self) -> Iterable[ImsFile]:
-        for file_path in self.path.iterdir():
-            if file_path.name[-4:] == 'json':
-                abs_path_str = str(file_path.absolute())
-                expected_csv_file_path = Path(abs_path_str[:-4] + 'csv')
+        with os.scandir(self.path) as it:
+            # follows symlinks (linked recordings are common); regular files are answered from the cached entry type
+            entries = [entry for entry in it if entry.is_file()]
 
-                if expected_csv_file_path.exists():
-                    yield ImsFile(path_telemetry=expected_csv_file_path, path_static=file_path)
+        # pair json / csv siblings by name instead of probing the filesystem for every file
+        names = {entry.name for entry in entries}
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                csv_path = entry.path[:-5] + '.csv'
+                if entry.name[:-5] + '.csv' in names:
+                    # both files were just listed, no need to stat them again
+                    yield ImsFile(path_telemetry=csv_path, path_static=entry.path, check_exists=False)
                 else:
-                    logging.warning(f"Could not find telemetry file `{expected_csv_file_path!s}` "
+                    logging.warning(f"Could not find telemetry file `{csv_path}` "
                                     f"(Code: 983908023)")
 
     def __iter__(self) -> Iterator[ImsFile]:
         """iterates over all session files ordered by `start_time` """
-        return iter(sorted(self.recordings, key=lambda sess: sess.start_time))
+        if self._sorted_recordings is None:
+            self._build_start_times()
+            order = sorted(range(len(self.recordings)), key=self._start_times.__getitem__)
+            self._sorted_recordings = [self.recordings[i] for i in order]
+
+        return iter(self._sorted_recordings)
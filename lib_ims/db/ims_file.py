@@ -1,51 +1,142 @@
 import datetime
-import json
+import functools
+import os
+import stat
+import sys
+import tempfile
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional, Union
 
 import pandas as pd
 
+try:
+    import orjson as json
+except ImportError:
+    import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pacsv = None
+    pq = None
+
+from ..exceptions import ImsException
+
+"""strings `pd.read_csv` treats as missing by default (see its `na_values` documentation)"""
+_PANDAS_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>',
+                     'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+"""timestamp format which never matches; pyarrow otherwise parses ISO-8601 columns which `pd.read_csv` keeps as
+strings"""
+_NO_TIMESTAMP_PARSERS = ['\x01no timestamps']
+
+"""boolean spellings of `pd.read_csv` (pyarrow additionally treats `1` / `0` as booleans)"""
+_PANDAS_TRUE_VALUES = ['True', 'TRUE', 'true']
+_PANDAS_FALSE_VALUES = ['False', 'FALSE', 'false']
+
+
+def _table_to_pandas(table: 'pa.Table') -> pd.DataFrame:
+    """ converts a table read by `ImsFile._read_telemetry_table` like `pd.read_csv` would have returned it """
+    df = table.to_pandas()
+
+    # booleans with missing values are objects holding NaN for pandas, not None
+    for field in table.schema:
+        if pa.types.is_boolean(field.type) and table.column(field.name).null_count:
+            df[field.name] = df[field.name].astype(object).where(df[field.name].notna(), float('nan'))
+
+    return df
+
 
 class ImsFile:
     """ Represents a database entry as a pair of telemetry data and static data"""
 
-    path_telemetry: Path
-    path_static: Path
+    """ cached attributes which are dropped by `prepare` """
+    _CACHED_PROPERTIES = ('static_data', 'start_time', 'player_id', 'track_id', 'simulator_id', 'n_players',
+                          'telemetry')
+
+    def __init__(self, path_telemetry: Union[Path, str], path_static: Union[Path, str], check_exists: bool = True):
+        """
+        :param check_exists: set to False if the caller already made sure both files exist (saves two stat calls)
+        """
+        # paths are kept as plain strings; `Path` objects are only created on demand
+        self._path_telemetry = os.fspath(path_telemetry)
+        self._path_static = os.fspath(path_static)
+        assert not check_exists or (os.path.exists(self._path_telemetry) and os.path.exists(self._path_static)), \
+            "Please make sure the passed file do exist (Code: 482309)"
+
+    @property
+    def path_telemetry(self) -> Path:
+        """ csv file holding the telemetry data """
+        return Path(self._path_telemetry)
 
-    """ JSON representation of `path_static` """
-    static_data: dict
+    @path_telemetry.setter
+    def path_telemetry(self, path: Union[Path, str]):
+        self._path_telemetry = os.fspath(path)
+        self.__dict__.pop('telemetry', None)
 
-    def __init__(self, path_telemetry: Path, path_static: Path):
-        assert path_telemetry.exists() and path_static.exists(), "Please make sure the passed file do exist (Code: 482309)"
+    @property
+    def path_static(self) -> Path:
+        """ json file holding the static data """
+        return Path(self._path_static)
 
-        self.path_telemetry = path_telemetry
-        self.path_static = path_static
+    @path_static.setter
+    def path_static(self, path: Union[Path, str]):
+        self._path_static = os.fspath(path)
         self.prepare()
 
     def prepare(self):
-        """ (re)initializes the data"""
-        self.static_data = json.loads(self.path_static.read_bytes())
+        """ (re)initializes the data; `static_data` will be read again on next access"""
+        for name in self._CACHED_PROPERTIES:
+            self.__dict__.pop(name, None)
+
+    @functools.cached_property
+    def static_data(self) -> dict:
+        """ JSON representation of `path_static` (parsed on first access) """
+        return self.read_static_data()
 
     @property
+    def is_static_data_loaded(self) -> bool:
+        """ checks if `static_data` was already parsed """
+        return 'static_data' in self.__dict__
+
+    def read_static_data(self) -> dict:
+        """ reads and parses `path_static` without touching the cached `static_data` """
+        with open(self._path_static, 'rb') as f:
+            static_data = json.loads(f.read())
+
+        # ids repeat across recordings; interning them makes hashing / comparing them in sets cheap
+        if isinstance(static_data.get('playerId'), str):
+            static_data['playerId'] = sys.intern(static_data['playerId'])
+        if isinstance(static_data.get('simulator'), str):
+            static_data['simulator'] = sys.intern(static_data['simulator'])
+        if isinstance(static_data.get('track'), dict) and isinstance(static_data['track'].get('name'), str):
+            static_data['track']['name'] = sys.intern(static_data['track']['name'])
+
+        return static_data
+
+    @functools.cached_property
     def start_time(self) -> datetime.datetime:
         """ when the recording started?"""
         return datetime.datetime.fromisoformat(self.static_data['startTime'])
 
-    @property
+    @functools.cached_property
     def player_id(self) -> str:
         """ id of the player"""
         return self.static_data['playerId']
 
-    @property
+    @functools.cached_property
     def track_id(self) -> str:
         """ id of the played track"""
         return self.static_data['track']['name']
 
-    @property
+    @functools.cached_property
     def simulator_id(self) -> str:
         return self.static_data['simulator']
 
-    @property
+    @functools.cached_property
     def n_players(self) -> int:
         """ how many cars are on the track while driving"""
         return self.static_data['numCars']
@@ -55,10 +146,121 @@ class ImsFile:
         """ checks if there was more than one player on the race """
         return self.n_players > 1
 
-    @property
+    @functools.cached_property
     def telemetry(self) -> pd.DataFrame:
-        """ telemetry data (driver over time) """
-        return pd.read_csv(self.path_telemetry)
+        """ telemetry data (driver over time); read once and cached until `prepare` is called
+
+        Warning: the cached frame lives as long as this object (an `ImsDatabase` keeps all of its recordings) and
+        is shared between callers, so changes made to it are seen by the next access. When going over many
+        recordings use `read_telemetry` (not cached) or `iter_telemetry` (chunked) instead, or call `prepare`
+        to free it.
+        """
+        return self.read_telemetry()
+
+    def read_telemetry(self) -> pd.DataFrame:
+        """ reads the telemetry data (driver over time) without caching it; every call returns a new frame
+        Prefers an up-to-date parquet copy (see `convert_telemetry_to_parquet`) and otherwise uses the multithreaded
+        pyarrow CSV reader if pyarrow is installed
+        """
+        if pq is not None and self.has_telemetry_parquet:
+            return _table_to_pandas(pq.read_table(self._path_telemetry_parquet, memory_map=True))
+
+        if pacsv is not None:
+            return _table_to_pandas(self._read_telemetry_table())
+
+        return pd.read_csv(self._path_telemetry, engine='c')
+
+    def _read_telemetry_table(self) -> 'pa.Table':
+        """ reads `path_telemetry` with pyarrow, using the column names, type inference and missing values of
+        `pd.read_csv` (use `_table_to_pandas` for converting the result)
+        """
+        # let pandas parse the header, so duplicate / empty names are mangled the same way (`a.1`, `Unnamed: 0`)
+        column_names = [*pd.read_csv(self._path_telemetry, nrows=0, engine='c').columns]
+
+        def read(column_types: Optional[dict[str, 'pa.DataType']] = None) -> 'pa.Table':
+            return pacsv.read_csv(self._path_telemetry,
+                                  read_options=pacsv.ReadOptions(use_threads=True, block_size=8 << 20,
+                                                                 column_names=column_names, skip_rows=1),
+                                  convert_options=pacsv.ConvertOptions(column_types=column_types,
+                                                                       null_values=_PANDAS_NA_VALUES,
+                                                                       true_values=_PANDAS_TRUE_VALUES,
+                                                                       false_values=_PANDAS_FALSE_VALUES,
+                                                                       strings_can_be_null=True,
+                                                                       timestamp_parsers=_NO_TIMESTAMP_PARSERS))
+
+        table = read()
+
+        # pyarrow infers date / time columns which `pd.read_csv` keeps as strings; those few are read again as text
+        text_columns = {field.name: pa.string() for field in table.schema
+                        if pa.types.is_date(field.type) or pa.types.is_time(field.type)}
+        if text_columns:
+            table = read(text_columns)
+
+        # columns without a single value are float (all NaN) for pandas
+        for i, field in enumerate(table.schema):
+            if pa.types.is_null(field.type):
+                table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+
+        return table
+
+    @property
+    def path_telemetry_parquet(self) -> Path:
+        """ location of the (optional) parquet copy of `path_telemetry` """
+        return Path(self._path_telemetry_parquet)
+
+    @property
+    def _path_telemetry_parquet(self) -> str:
+        return os.path.splitext(self._path_telemetry)[0] + '.parquet'
+
+    @property
+    def has_telemetry_parquet(self) -> bool:
+        """ checks for a parquet copy which is not older than the telemetry csv (the csv is the source of truth) """
+        try:
+            parquet_stat = os.stat(self._path_telemetry_parquet)
+        except FileNotFoundError:
+            return False
+
+        return parquet_stat.st_mtime >= os.stat(self._path_telemetry).st_mtime
+
+    def convert_telemetry_to_parquet(self, overwrite: bool = False) -> Path:
+        """ stores the telemetry data next to the csv file as parquet, which makes subsequent reads of `telemetry`
+        much faster (requires pyarrow)
+        :param overwrite: rewrite the parquet file even if an up-to-date one exists
+        :return: path of the parquet file
+        """
+        if pacsv is None:
+            raise ImsException("Converting telemetry to parquet requires `pyarrow` to be installed (Code: 7349021)")
+
+        if overwrite or not self.has_telemetry_parquet:
+            # write next to the target and move it into place, so an interrupted write never leaves a parquet file
+            # which looks up-to-date; the csv is read the same way as by `telemetry` to keep the dtypes identical
+            fd, tmp_path = tempfile.mkstemp(suffix='.parquet.tmp',
+                                            dir=os.path.dirname(self._path_telemetry_parquet) or '.')
+            os.close(fd)
+            try:
+                pq.write_table(self._read_telemetry_table(), tmp_path)
+                # `mkstemp` creates the file as owner-only; readers of the csv have to be able to read the copy too
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(self._path_telemetry).st_mode))
+                os.replace(tmp_path, self._path_telemetry_parquet)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return self.path_telemetry_parquet
+
+    def iter_telemetry(self, chunksize: int = 100_000, usecols: Optional[list[str]] = None,
+                       dtype: Optional[dict[str, Any]] = None) -> Iterator[pd.DataFrame]:
+        """ streams the telemetry data in chunks of `chunksize` rows without loading the whole file into memory
+
+        Note: the chunks are always parsed from the csv by `pd.read_csv` (a parquet copy is not used) and dtypes are
+        inferred per chunk. A column that is empty within a chunk, for example, will be float there while
+        `read_telemetry` may report another dtype for the whole file. Pass `dtype` to get fixed dtypes.
+
+        :param chunksize: rows per returned DataFrame
+        :param usecols: if given, only these columns will be read
+        :param dtype: optional dtypes per column (see `pd.read_csv`)
+        """
+        return pd.read_csv(self._path_telemetry, chunksize=chunksize, usecols=usecols, dtype=dtype, engine='c')
 
     @property
     def extra_info(self) -> dict[str, Any]:
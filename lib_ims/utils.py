@@ -3,9 +3,10 @@ from __future__ import annotations
 import asyncio
 import os
 import logging
+import mmap
+import posixpath
 import tempfile
-from asyncio import Task
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import BinaryIO
 
@@ -39,6 +40,25 @@ IMS_DATASET_META = {
     },
 }
 
+"""(version identifier, short description, licence info) of all public `IMS_DATASET_META` entries"""
+_PUBLIC_VERSIONS = tuple((key, value['description'], value['licence_notice']) for key, value in IMS_DATASET_META.items()
+                         if not key.startswith('_'))
+
+
+class _ReadOnlyMmap(mmap.mmap):
+    """ `mmap` usable as file object for `zipfile` (which requires `seekable()`; only provided on Python 3.13+) """
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, pos: int, whence: int = os.SEEK_SET):
+        # file objects raise OSError on invalid positions, which `zipfile` relies on for files shorter than its
+        # end-of-archive record; `mmap` raises ValueError instead
+        try:
+            return super().seek(pos, whence)
+        except ValueError as e:
+            raise OSError(str(e)) from e
+
 
 def get_ims_logger() -> logging.Logger:
     """
@@ -75,27 +95,26 @@ def download_db(version: str = 'latest', target_path: Path | None = None):
 
     download_path = target_path / 'download.zip'
     with open(download_path, 'wb') as f:
-        task = asyncio.create_task(_async_get_url(version['url'], file_handle=f))
-        loop = asyncio.get_event_loop()
-        finished, unfinished = loop.run_until_complete(
-            asyncio.wait([task], timeout=None)
-        )
-        task: Task = [*finished][0]
-        total_bytes = task.result()
+        total_bytes = asyncio.run(_async_get_url(version['url'], file_handle=f))
         get_ims_logger().info(f"Finished downloading ({total_bytes} bytes) to {download_path!s} "
                               f"(Code: 48293048)")
 
     try:
-        with open(download_path, 'rb') as f:
-            #data = f.read()
-            #print(len(data), data[:10])
-            if not zipfile.is_zipfile(f):
-                raise ImsException(f"Download of {version} did not return a valid zip file (Code: 9382930)")
+        # an empty file can neither be mapped nor be a zip file
+        if not total_bytes:
+            raise ImsException(f"Download of {version} did not return a valid zip file (Code: 9382930)")
+
+        # mapping the archive saves buffered reads while seeking through the central directory
+        with open(download_path, 'rb') as f, _ReadOnlyMmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                file = zipfile.ZipFile(mm)
+            except zipfile.BadZipFile as e:
+                raise ImsException(f"Download of {version} did not return a valid zip file (Code: 9382930)") from e
 
             get_ims_logger().info(f"Extracting zip file to `{target_path!s}` (Code: 3924890234)")
-            file = zipfile.ZipFile(f)
-            file.extractall(target_path)
-            get_ims_logger().info(f"Extracting to `{target_path!s}` was successful (Code: 923849203)")
+            with file:
+                _extract_zip(file, target_path)
+        get_ims_logger().info(f"Extracting to `{target_path!s}` was successful (Code: 923849203)")
 
     finally:
         if download_path.is_file():
@@ -109,34 +128,69 @@ def get_ims_versions() -> list[tuple[str, str, str]]:
     :return: tuples of (version identifier, short description, licence info)
     """
 
-    return list((key, value['description'], value['licence_notice']) for key, value in IMS_DATASET_META.items()
-                if not key.startswith('_'))
+    return list(_PUBLIC_VERSIONS)
+
 
+def _extract_zip(file: zipfile.ZipFile, target_path: Path, parallel_min_members: int = 32):
+    """
+    extracts all members of `file`, archives with many members are extracted on a thread pool
+    (decompression releases the GIL)
 
-async def _async_get_url(url: str, file_handle: BinaryIO, chunk_size_bytes: int = 1024 * 1024) -> int:
+    :param parallel_min_members: archives with up to that many members are extracted sequentially
+    """
+    infos = file.infolist()
+    if len(infos) <= parallel_min_members:
+        file.extractall(target_path)
+        return
+
+    # extract one member per directory up front so the workers don't race on creating the directories
+    seen_dirs = set()
+    remaining = []
+    for info in infos:
+        directory = posixpath.dirname(info.filename.rstrip('/'))
+        if info.is_dir() or directory not in seen_dirs:
+            seen_dirs.add(directory)
+            file.extract(info, target_path)
+        else:
+            remaining.append(info)
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        # consume the results so exceptions of the workers are raised here
+        list(executor.map(lambda info: file.extract(info, target_path), remaining))
+
+
+async def _async_get_url(url: str, file_handle: BinaryIO, chunk_size_bytes: int = 8 * 1024 * 1024,
+                         log_every_bytes: int = 5 * 1024 * 1024) -> int:
     """
     reads data in chunks and reports progress
 
     :param url:
+    :param log_every_bytes: progress is reported whenever at least that many bytes arrived since the last report
     :return: total bytes read
     """
+    logger = get_ims_logger()
     currently_downloaded_bytes = 0
-    async with aiohttp.ClientSession() as sess:
-        async with sess.get(url, timeout=ClientTimeout(total=6000)) as rsp:
-            content_length = int(rsp.headers.get('Content-Length'))
+    last_logged_bytes = 0
+    # the archive is requested without content encoding so the body can be written as-is
+    connector = aiohttp.TCPConnector(limit=1, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False) as sess:
+        async with sess.get(url, timeout=ClientTimeout(total=6000), headers={'Accept-Encoding': 'identity'}) as rsp:
+            content_length = int(rsp.headers.get('Content-Length', 0))
             while read_data := await rsp.content.read(chunk_size_bytes):
-                if content_length:
-                    progress_str = f"of {content_length / 1024 / 1024:.2f}MB " \
-                                   f"({(currently_downloaded_bytes / content_length)*100:.2f}%)"
-                else:
-                    progress_str = "of unknown size"
-
                 currently_downloaded_bytes += len(read_data)
                 file_handle.write(read_data)
 
-                if (currently_downloaded_bytes % (1024 * 1024 * 5)) == 0:
-                    get_ims_logger().info(f"Currently Downloaded "
-                                          f"{currently_downloaded_bytes / 1024 / 1024:.2f}MB {progress_str} "
-                                          f"(Code: 4823474)")
+                if currently_downloaded_bytes - last_logged_bytes >= log_every_bytes \
+                        and logger.isEnabledFor(logging.INFO):
+                    last_logged_bytes = currently_downloaded_bytes
+                    if content_length:
+                        progress_str = f"of {content_length / 1024 / 1024:.2f}MB " \
+                                       f"({(currently_downloaded_bytes / content_length)*100:.2f}%)"
+                    else:
+                        progress_str = "of unknown size"
+
+                    logger.info(f"Currently Downloaded "
+                                f"{currently_downloaded_bytes / 1024 / 1024:.2f}MB {progress_str} "
+                                f"(Code: 4823474)")
 
     return currently_downloaded_bytes
@@ -7,5 +7,6 @@ setup(
    author='Richard Vogel',
    author_email='richard.vogel@gmx.net',
    packages=['lib_ims', 'lib_ims.db'],
-   install_requires=['aiohttp', 'pandas'],
+   install_requires=['aiohttp', 'pandas', 'orjson'],
+   extras_require={'pyarrow': ['pyarrow']},
 )
@@ -0,0 +1,361 @@
+import asyncio
+import io
+import json
+import os
+import stat
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+import pandas as pd
+
+from lib_ims import ImsDatabase, ImsFile
+from lib_ims import utils
+from lib_ims.db import ims_file
+from lib_ims.exceptions import ImsException
+
+TELEMETRY_CSV = "time,timestamp,split,lastTime,speed,isPitting\n" \
+                "0,2022-01-01T10:00:00,,1:02.3,10.5,False\n" \
+                "1,2022-01-01T10:00:01,S1,,NA,True\n" \
+                "2,,NaN,1:01.9,,False\n"
+
+
+def write_recording(path: Path, name: str, start_time: str = '2022-01-01T10:00:00', player_id: str = 'p1',
+                    telemetry: str = TELEMETRY_CSV, with_csv: bool = True):
+    """ writes the static json (and, optionally, the telemetry csv) of a recording `name` into `path`"""
+    (path / f'{name}.json').write_text(json.dumps({
+        'startTime': start_time,
+        'playerId': player_id,
+        'track': {'name': 'track'},
+        'simulator': 'sim',
+        'numCars': 1,
+        'extra_info': {},
+    }))
+    if with_csv:
+        (path / f'{name}.csv').write_text(telemetry)
+
+
+class OfflineTests(TestCase):
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def _recording(self, name: str = 'rec') -> ImsFile:
+        write_recording(self.path, name)
+        return ImsFile(path_telemetry=self.path / f'{name}.csv', path_static=self.path / f'{name}.json')
+
+    def test_db_pairs_static_and_telemetry_files(self):
+        write_recording(self.path, 'paired')
+        write_recording(self.path, 'orphan', with_csv=False)
+        (self.path / 'nojson').write_text('{}')
+        (self.path / 'nojson.csv').write_text(TELEMETRY_CSV)
+        (self.path / 'folder.json').mkdir()
+        (self.path / 'licence.txt').write_text('licence')
+
+        with self.assertLogs(level='WARNING') as logs:
+            db = ImsDatabase(self.path)
+
+        self.assertEqual(1, db.n_recordings)
+        rec = db.recordings[0]
+        self.assertEqual((self.path / 'paired.json', self.path / 'paired.csv'), (rec.path_static, rec.path_telemetry))
+        self.assertEqual(1, len(logs.output))
+        self.assertIn('orphan.csv', logs.output[0])
+
+    def test_db_follows_symlinked_recordings(self):
+        with tempfile.TemporaryDirectory() as other_dir:
+            write_recording(Path(other_dir), 'linked')
+            for suffix in ('.json', '.csv'):
+                os.symlink(Path(other_dir) / f'linked{suffix}', self.path / f'linked{suffix}')
+
+            db = ImsDatabase(self.path)
+            self.assertEqual(['linked'], [rec.path_static.stem for rec in db])
+            self.assertEqual({'p1'}, db.players)
+
+    def test_db_prefetch_loads_all_static_data_once(self):
+        for i in range(20):
+            write_recording(self.path, f'rec{i}', player_id=f'p{i % 3}')
+
+        db = ImsDatabase(self.path)
+        self.assertFalse(any(rec.is_static_data_loaded for rec in db.recordings))
+
+        db.prefetch(max_workers=4)
+        self.assertTrue(all(rec.is_static_data_loaded for rec in db.recordings))
+        self.assertEqual({f'rec{i}': f'p{i % 3}' for i in range(20)},
+                         {rec.path_static.stem: rec.static_data['playerId'] for rec in db.recordings})
+
+        with mock.patch.object(ImsFile, 'read_static_data', side_effect=AssertionError("unexpected read")), \
+                mock.patch('builtins.open', side_effect=AssertionError("unexpected open")):
+            db.prefetch()
+            self.assertEqual({'p0', 'p1', 'p2'}, db.players)
+
+    def test_db_index_does_not_stat_listed_files(self):
+        write_recording(self.path, 'a')
+        write_recording(self.path, 'b')
+
+        with mock.patch.object(ims_file.os.path, 'exists', side_effect=AssertionError("unexpected stat")):
+            self.assertEqual(2, ImsDatabase(self.path).n_recordings)
+
+    @unittest.skipIf(ims_file.pacsv is None, "requires pyarrow")
+    def test_telemetry_matches_pandas_csv_reader(self):
+        """ reading via pyarrow (csv and parquet copy) must produce the same frame as `pd.read_csv` """
+        cases = {
+            'mixed': TELEMETRY_CSV,
+            'never_filled_column': "time,split\n0,\n1,\n",
+            'date_and_time_only': "day,clock,clockFraction\n2022-01-01,10:00:00,10:00:00.5\n2022-01-02,11:00:00,\n",
+            'duplicate_and_empty_headers': "a,a,a.1,,b\n1,2,3,4,5\n",
+            'nullable_bool': "isPitting,lap\nTrue,1\n,0\nFalse,1\n",
+            'numeric_bool_spellings': "flag\n1\ntrue\n",
+        }
+        for name, telemetry_csv in cases.items():
+            with self.subTest(name):
+                write_recording(self.path, name, telemetry=telemetry_csv)
+                rec = ImsFile(path_telemetry=self.path / f'{name}.csv', path_static=self.path / f'{name}.json')
+                expected = pd.read_csv(rec.path_telemetry, engine='c')
+
+                telemetry = rec.read_telemetry()
+                self.assertEqual(expected.dtypes.to_dict(), telemetry.dtypes.to_dict())
+                self.assertTrue(expected.isna().equals(telemetry.isna()))
+                pd.testing.assert_frame_equal(expected, telemetry)
+
+                rec.convert_telemetry_to_parquet()
+                pd.testing.assert_frame_equal(expected, rec.read_telemetry())
+
+    def test_db_iterates_ordered_by_start_time_with_only_start_time_given(self):
+        """ sorting must not require the static data to contain anything besides `startTime` """
+        write_recording(self.path, 'late', start_time='2022-01-02T10:00:00')
+        write_recording(self.path, 'early', start_time='2022-01-01T10:00:00')
+        (self.path / 'minimal.json').write_text(json.dumps({'startTime': '2022-01-01T12:00:00'}))
+        (self.path / 'minimal.csv').write_text(TELEMETRY_CSV)
+
+        db = ImsDatabase(self.path)
+        self.assertEqual(['early', 'minimal', 'late'], [sess.path_static.stem for sess in db])
+        self.assertEqual(['early', 'minimal', 'late'], [sess.path_static.stem for sess in db])
+
+    def test_changing_paths_changes_what_is_read(self):
+        rec = self._recording()
+        write_recording(self.path, 'other', player_id='p2', telemetry="time\n42\n")
+        self.assertEqual('p1', rec.player_id)
+        self.assertEqual(3, len(rec.telemetry))
+
+        rec.path_telemetry = str(self.path / 'other.csv')
+        rec.path_static = self.path / 'other.json'
+
+        self.assertEqual(self.path / 'other.csv', rec.path_telemetry)
+        self.assertEqual([42], rec.telemetry['time'].tolist())
+        self.assertEqual([42], pd.concat(rec.iter_telemetry())['time'].tolist())
+        self.assertEqual(self.path / 'other.parquet', rec.path_telemetry_parquet)
+        self.assertEqual('p2', rec.player_id)
+
+    def test_iter_telemetry_in_chunks(self):
+        rows = '\n'.join(f'{i},{i * 0.5},lap{i % 3}' for i in range(25))
+        write_recording(self.path, 'long', telemetry=f'time,speed,lap\n{rows}\n')
+        rec = ImsFile(path_telemetry=self.path / 'long.csv', path_static=self.path / 'long.json')
+
+        chunks = [*rec.iter_telemetry(chunksize=10)]
+        self.assertEqual([10, 10, 5], [len(chunk) for chunk in chunks])
+        pd.testing.assert_frame_equal(rec.read_telemetry(), pd.concat(chunks))
+
+        chunks = [*rec.iter_telemetry(chunksize=10, usecols=['time', 'lap'])]
+        self.assertEqual(3, len(chunks))
+        self.assertTrue(all(list(chunk.columns) == ['time', 'lap'] for chunk in chunks))
+        pd.testing.assert_frame_equal(rec.read_telemetry()[['time', 'lap']], pd.concat(chunks))
+
+    def test_read_telemetry_is_not_cached(self):
+        rec = self._recording()
+
+        self.assertIsNot(rec.read_telemetry(), rec.read_telemetry())
+        self.assertNotIn('telemetry', rec.__dict__)
+
+        self.assertIs(rec.telemetry, rec.telemetry)
+        rec.prepare()
+        self.assertNotIn('telemetry', rec.__dict__)
+
+    @unittest.skipIf(ims_file.pq is None, "requires pyarrow")
+    def test_parquet_copy_is_used_and_keeps_dtypes(self):
+        rec = self._recording()
+        from_csv = rec.telemetry
+
+        self.assertFalse(rec.has_telemetry_parquet)
+        self.assertEqual(rec.path_telemetry_parquet, rec.convert_telemetry_to_parquet())
+        self.assertTrue(rec.has_telemetry_parquet)
+
+        rec.prepare()
+        with mock.patch.object(ims_file.pacsv, 'read_csv', side_effect=AssertionError("csv should not be read")):
+            from_parquet = rec.telemetry
+
+        pd.testing.assert_frame_equal(from_csv, from_parquet)
+
+    @unittest.skipIf(ims_file.pq is None, "requires pyarrow")
+    def test_parquet_copy_has_the_permissions_of_the_csv(self):
+        rec = self._recording()
+        for mode in (0o644, 0o640):
+            os.chmod(rec.path_telemetry, mode)
+            rec.convert_telemetry_to_parquet(overwrite=True)
+            self.assertEqual(mode, stat.S_IMODE(os.stat(rec.path_telemetry_parquet).st_mode))
+
+    @unittest.skipIf(ims_file.pq is None, "requires pyarrow")
+    def test_outdated_parquet_copy_is_ignored(self):
+        rec = self._recording()
+        rec.convert_telemetry_to_parquet()
+        (self.path / 'rec.csv').write_text("time\n42\n")
+        csv_mtime = os.stat(rec.path_telemetry).st_mtime
+        os.utime(rec.path_telemetry_parquet, (csv_mtime - 10, csv_mtime - 10))
+
+        self.assertFalse(rec.has_telemetry_parquet)
+        self.assertEqual([42], rec.telemetry['time'].tolist())
+
+        rec.prepare()
+        rec.convert_telemetry_to_parquet()
+        self.assertTrue(rec.has_telemetry_parquet)
+        self.assertEqual([42], rec.telemetry['time'].tolist())
+
+    @unittest.skipIf(ims_file.pq is None, "requires pyarrow")
+    def test_interrupted_parquet_conversion_leaves_no_file(self):
+        def write_truncated(table, where):
+            Path(where).write_bytes(b'PAR1')
+            raise KeyboardInterrupt
+
+        rec = self._recording()
+        with mock.patch.object(ims_file.pq, 'write_table', side_effect=write_truncated):
+            with self.assertRaises(KeyboardInterrupt):
+                rec.convert_telemetry_to_parquet()
+
+        self.assertEqual(['rec.csv', 'rec.json'], sorted(p.name for p in self.path.iterdir()))
+        self.assertFalse(rec.has_telemetry_parquet)
+
+    def test_csv_fallback_without_pyarrow(self):
+        rec = self._recording()
+        expected = pd.read_csv(rec.path_telemetry, engine='c')
+
+        with mock.patch.object(ims_file, 'pacsv', None), mock.patch.object(ims_file, 'pq', None):
+            pd.testing.assert_frame_equal(expected, rec.telemetry)
+            with self.assertRaises(ImsException):
+                rec.convert_telemetry_to_parquet()
+
+    def _write_zip(self, members: dict[str, bytes]) -> Path:
+        zip_path = self.path / 'archive.zip'
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as file:
+            for name, content in members.items():
+                file.writestr(name, content)
+
+        return zip_path
+
+    def _assert_extracted(self, members: dict[str, bytes], target: Path):
+        extracted = {path.relative_to(target).as_posix(): path.read_bytes()
+                     for path in target.rglob('*') if path.is_file()}
+        self.assertEqual(members, extracted)
+
+    def test_extract_zip_parallel_nested_archive(self):
+        members = {f'rec{i}.json': f'{{"i": {i}}}'.encode() for i in range(40)}
+        members.update({f'nested/dir{i % 4}/sub/rec{i}.csv': str(i).encode() * 1000 for i in range(80)})
+        members['licence.txt'] = b'licence'
+        zip_path = self._write_zip(members)
+
+        with tempfile.TemporaryDirectory() as target, zipfile.ZipFile(zip_path) as file, \
+                mock.patch.object(utils, 'ThreadPoolExecutor', wraps=utils.ThreadPoolExecutor) as executor:
+            utils._extract_zip(file, Path(target))
+            executor.assert_called_once()
+            self._assert_extracted(members, Path(target))
+
+    def test_extract_zip_small_archive_sequentially(self):
+        members = {'rec.json': b'{}', 'rec.csv': b'time\n1\n'}
+        zip_path = self._write_zip(members)
+
+        with tempfile.TemporaryDirectory() as target, zipfile.ZipFile(zip_path) as file, \
+                mock.patch.object(utils, 'ThreadPoolExecutor', side_effect=AssertionError("no pool expected")):
+            utils._extract_zip(file, Path(target))
+            self._assert_extracted(members, Path(target))
+
+    def _stubbed_get_url(self, chunks: list[bytes], headers: dict[str, str]) -> tuple[int, bytes, list[str]]:
+        """ runs `_async_get_url` against a stubbed response returning `chunks`
+        :return: reported bytes, written bytes and the logged progress lines
+        """
+        class Content:
+            async def read(self, n: int) -> bytes:
+                return chunks.pop(0) if chunks else b''
+
+        class Response:
+            content = Content()
+
+            def __init__(self):
+                self.headers = headers
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+        class Session(Response):
+            def __init__(self, *args, **kwargs):
+                super().__init__()
+
+            def get(self, *args, **kwargs):
+                return Response()
+
+        file_handle = io.BytesIO()
+        with mock.patch.object(utils.aiohttp, 'ClientSession', Session), \
+                mock.patch.object(utils.aiohttp, 'TCPConnector'), \
+                self.assertLogs(utils.get_ims_logger(), level='INFO') as logs:
+            total_bytes = asyncio.run(utils._async_get_url('http://localhost/none.zip', file_handle))
+            # assertLogs requires at least one line
+            utils.get_ims_logger().info("done")
+
+        progress = [line for line in logs.output if 'Currently Downloaded' in line]
+        return total_bytes, file_handle.getvalue(), progress
+
+    def test_download_progress_is_logged_without_hitting_exact_boundaries(self):
+        # 3 MiB + 7 bytes never sums up to a multiple of 5 MiB
+        chunk = b'x' * (3 * 1024 * 1024 + 7)
+        total_bytes, written, progress = self._stubbed_get_url([chunk] * 7,
+                                                               {'Content-Length': str(7 * len(chunk))})
+
+        self.assertEqual(7 * len(chunk), total_bytes)
+        self.assertEqual(7 * len(chunk), len(written))
+        # logged after chunk 2, 4 and 6 (at least 5 MiB since the last line each)
+        self.assertEqual(3, len(progress))
+        self.assertIn('6.00MB of 21.00MB', progress[0])
+
+    def test_download_progress_of_unknown_size(self):
+        total_bytes, _, progress = self._stubbed_get_url([b'x' * (6 * 1024 * 1024)], {})
+
+        self.assertEqual(6 * 1024 * 1024, total_bytes)
+        self.assertEqual(1, len(progress))
+        self.assertIn('of unknown size', progress[0])
+
+    def _download(self, content: bytes, target: Path):
+        """ runs `download_db` with a download returning `content` """
+        async def fake_get_url(url, file_handle):
+            file_handle.write(content)
+            return len(content)
+
+        meta = {'url': 'http://localhost/none.zip', 'description': '', 'licence_notice': ''}
+        with mock.patch.dict(utils.IMS_DATASET_META, {'_offline': meta}), \
+                mock.patch.object(utils, '_async_get_url', fake_get_url):
+            utils.download_db(version='_offline', target_path=target)
+
+    def test_download_extracts_zip(self):
+        members = {f'rec{i}.json': b'{}' for i in range(50)}
+        content = self._write_zip(members).read_bytes()
+
+        with tempfile.TemporaryDirectory() as target:
+            self._download(content, Path(target))
+            self._assert_extracted(members, Path(target))
+
+    def test_download_rejects_invalid_or_empty_zip(self):
+        for content in (b'', b'this is no zip file', TELEMETRY_CSV.encode()):
+            with tempfile.TemporaryDirectory() as target:
+                with self.assertRaises(ImsException):
+                    self._download(content, Path(target))
+
+                # the download itself is removed again
+                self.assertEqual([], [*Path(target).iterdir()])
+
+
+if __name__ == '__main__':
+    unittest.main()